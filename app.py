@@ -1,14 +1,32 @@
 import streamlit as st
+import asyncio
 import base64
-from openai import OpenAI
-import openai
-from PIL import Image
+import contextlib
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
 import io
+import itertools
+import math
 import os
+import queue
+import re
+from pathlib import Path
+import time
+
+from tile_catalog import TILE_NAMES, TILE_OPTIONS
+
+# openai and PIL are imported inside the functions that need them, so the
+# password screen can render before those heavy modules are loaded.
 
 def check_password():
     """Returns `True` if the user has entered the correct password."""
     
+    # Already authenticated: skip the secrets lookup on every rerun
+    if st.session_state.get("password_correct", False):
+        return True
+    
     try:
         # This will raise an error if secrets.toml doesn't exist or if the password is not set.
         password_from_secrets = st.secrets["PASSWORD"]
@@ -35,9 +53,6 @@ PASSWORD = "your-password"
         else:
             st.session_state["password_correct"] = False
 
-    if st.session_state.get("password_correct", False):
-        return True
-
     # Show password input
     st.text_input(
         "Password", type="password", on_change=password_entered, key="password"
@@ -52,12 +67,15 @@ PASSWORD = "your-password"
 @st.cache_resource
 def get_openai_client():
     # Make sure you have the latest OpenAI library: pip install openai>=1.0.0
+    from openai import OpenAI
+    
     if "OPENAI_API_KEY" not in st.secrets or not st.secrets["OPENAI_API_KEY"]:
         st.error("OpenAI API key not found in secrets.")
         st.info("Please add `OPENAI_API_KEY = 'sk-...'` to your `.streamlit/secrets.toml` file and refresh.")
         st.stop()
         
-    client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+    # Retries are handled by create_response_with_retry so the user gets feedback between attempts
+    client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"], max_retries=0)
     
     # Debug: Check if responses attribute exists
     if not hasattr(client, 'responses'):
@@ -66,25 +84,326 @@ def get_openai_client():
     
     return client
 
-def encode_image_to_base64(image):
-    """Convert PIL Image to base64 string"""
-    buffer = io.BytesIO()
-    image.save(buffer, format="PNG")
+def create_async_openai_client():
+    """Build an AsyncOpenAI client for the current event loop.
+
+    Not cached with st.cache_resource: its httpx connection pool is bound to the event loop
+    it was first used on, and every asyncio.run() starts a new one. Use it with `async with`.
+    """
+    from openai import AsyncOpenAI
+    
+    # Reuse the validated key from the cached sync client
+    return AsyncOpenAI(api_key=get_openai_client().api_key, max_retries=0)
+
+# How often a request waiting for a free limiter slot checks again (seconds)
+SLOT_POLL_INTERVAL = 0.05
+
+class ApiRateLimiter:
+    """Process-wide cap on concurrent and per-second API requests, shared by all sessions"""
+
+    def __init__(self, max_concurrent=5, requests_per_second=2.0):
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._rate = requests_per_second
+        self._capacity = max(1.0, requests_per_second)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+
+    def _take_token(self):
+        """Block until the token bucket allows another request"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """Hold a request slot for the duration of one API call"""
+        # The semaphore is shared with other sessions' threads. Poll it instead of waiting in
+        # asyncio.to_thread: a cancelled to_thread call still acquires in its worker thread,
+        # and that slot would never be released
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(SLOT_POLL_INTERVAL)
+        try:
+            await asyncio.to_thread(self._take_token)
+            yield
+        finally:
+            self._slots.release()
+
+@st.cache_resource
+def get_api_limiter():
+    # Conservative default (~2 req/s peak) so many sessions behind one password don't trip the RPM limit
+    return ApiRateLimiter(max_concurrent=5, requests_per_second=2.0)
+
+class GenerationCache:
+    """Thread-safe LRU of finished generations with a time-to-live, shared by all sessions.
+
+    st.cache_data is not used for this: it replays every st element called during the
+    cached function, and the retry toasts target a block created outside of it, which
+    makes every later cache hit fail with CacheReplayClosureError.
+    """
+
+    def __init__(self, max_entries=32, ttl=3600):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+        self._ttl = ttl
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self._ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+@st.cache_resource
+def get_generation_cache():
+    return GenerationCache(max_entries=64, ttl=3600)
+
+MAX_API_ATTEMPTS = 3
+
+# Low-resolution previews the image tool streams before the final render (0-3)
+PARTIAL_IMAGES = 2
+
+async def _collect_response_stream(stream, on_partial_image):
+    """Forward streamed partial images to on_partial_image and return the completed response"""
+    async for event in stream:
+        if event.type == "response.image_generation_call.partial_image":
+            on_partial_image(event.partial_image_b64)
+        elif event.type == "response.completed":
+            return event.response
+        elif event.type == "response.failed":
+            error = event.response.error
+            raise RuntimeError(error.message if error else "Generatie mislukt.")
+        elif event.type == "error":
+            raise RuntimeError(event.message)
+    raise NoImageGenerated()
+
+async def create_response_with_retry(client, on_partial_image=None, **kwargs):
+    """Call client.responses.create, retrying transient errors with exponential backoff.
+
+    With on_partial_image the response is streamed and each partial image (base64) is
+    passed to it as it arrives; the completed response is returned either way.
+    """
+    import openai
+    
+    # Transient API errors worth retrying; anything else (e.g. AuthenticationError) fails fast
+    retryable_errors = (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+    for attempt in range(1, MAX_API_ATTEMPTS + 1):
+        try:
+            async with get_api_limiter().slot():
+                if on_partial_image is None:
+                    return await client.responses.create(**kwargs)
+                # Hold the slot until the stream is fully consumed; closing it releases the HTTP
+                # response right away, also when an error event or retryable error ends it early
+                stream = await client.responses.create(stream=True, **kwargs)
+                async with stream:
+                    return await _collect_response_stream(stream, on_partial_image)
+        except retryable_errors as e:
+            if attempt == MAX_API_ATTEMPTS:
+                raise
+            delay = min(2 * 2 ** (attempt - 1), 30)
+            st.toast(f"⏳ Tijdelijke fout ({type(e).__name__}), opnieuw proberen over {delay} seconden...")
+            await asyncio.sleep(delay)
+
+def _hash_bytes(data):
+    """Fast cache key for large image blobs"""
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+# Shared by every st.cache_data below: blake2b runs at GB/s on multi-MB images,
+# well ahead of Streamlit's default hasher
+IMAGE_HASH_FUNCS = {bytes: _hash_bytes}
+
+@st.cache_resource
+def get_buffer_pool():
+    # Reusable encode buffers. Held in cache_resource because module globals of the main
+    # script are rebuilt on every rerun. Encodes run on worker threads, so the pool must be
+    # thread-safe; LIFO hands out the most recently used (cache-warm) buffer first.
+    return queue.LifoQueue(maxsize=8)
+
+@contextlib.contextmanager
+def pooled_bytesio():
+    """Borrow a BytesIO from the pool and give it back afterwards"""
+    pool = get_buffer_pool()
+    try:
+        buffer = pool.get_nowait()
+    except queue.Empty:
+        buffer = io.BytesIO()
+    # Rewind only: truncate(0) would shrink the allocation we are trying to reuse.
+    # Stale bytes past the write position are never read, see written_view().
     buffer.seek(0)
-    return base64.b64encode(buffer.getvalue()).decode()
+    try:
+        yield buffer
+    finally:
+        try:
+            pool.put_nowait(buffer)
+        except queue.Full:
+            buffer.close()
+
+@contextlib.contextmanager
+def written_view(buffer):
+    """Zero-copy view of what was written to a pooled buffer, released on exit"""
+    # An exported view pins the buffer (it cannot grow while one is alive), so both the
+    # full view and its slice are released before the buffer goes back to the pool
+    with buffer.getbuffer() as full, full[:buffer.tell()] as view:
+        yield view
+
+def image_to_png_bytes(image):
+    """Convert PIL Image to PNG bytes"""
+    with pooled_bytesio() as buffer:
+        image.save(buffer, format="PNG")
+        with written_view(buffer) as view:
+            return bytes(view)
+
+def detect_image_mime(raw, fallback=None):
+    """Detect image MIME type from magic bytes"""
+    if raw.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if raw.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if raw[:4] == b"RIFF" and raw[8:12] == b"WEBP":
+        return "image/webp"
+    return fallback
+
+# Image formats the OpenAI Responses API accepts as-is
+SUPPORTED_IMAGE_MIMES = ("image/png", "image/jpeg", "image/webp")
+
+# The model does not use more detail than this, so larger photos only cost upload time and tokens
+MAX_IMAGE_EDGE = 1536
+
+# Above this, a small-but-heavy file (e.g. a lossless PNG photo) is cheaper to re-encode than to upload
+MAX_PASSTHROUGH_BYTES = 1024 * 1024
+
+def has_alpha(image):
+    """Check whether a PIL Image carries transparency"""
+    return image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+
+# Data URL prefixes, encoded once so building a URL is a single bytes concat
+DATA_URL_PREFIXES = {mime: f"data:{mime};base64,".encode("ascii") for mime in SUPPORTED_IMAGE_MIMES}
+
+def to_data_url(raw, mime):
+    """Build a base64 data URL from raw bytes"""
+    # One concat of the encoded blob and one ascii decode - the blob is copied twice, not three times
+    return (DATA_URL_PREFIXES[mime] + base64.b64encode(raw)).decode("ascii")
+
+def _encode_to_data_url(raw, mime, max_edge):
+    """Convert raw image bytes to a data URL, downscaling when needed"""
+    from PIL import Image, ImageOps
+    
+    mime = detect_image_mime(raw, fallback=mime)
+    image = Image.open(io.BytesIO(raw))
+    if mime in SUPPORTED_IMAGE_MIMES and max(image.size) <= max_edge and len(raw) <= MAX_PASSTHROUGH_BYTES:
+        # Already small and in a format the API accepts - send the original bytes untouched
+        return to_data_url(raw, mime)
+    
+    resample = Image.LANCZOS
+    # Multi-picture JPEGs from phone cameras open as MPO, which supports draft too
+    if image.format in ("JPEG", "MPO") and max(image.size) > max_edge:
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale (never below the target size) instead of
+        # decoding every pixel; must happen before anything loads the image
+        ratio = max_edge / max(image.size)
+        image.draft("RGB", (math.ceil(image.width * ratio), math.ceil(image.height * ratio)))
+        # draft already did the heavy reduction, bilinear is enough for the remaining < 2x
+        resample = Image.BILINEAR
+    
+    # Re-encoding drops EXIF, so bake the phone's orientation into the pixels first
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_edge, max_edge), resample)
+    with pooled_bytesio() as buffer:
+        if has_alpha(image):
+            # Keep transparency (e.g. tile swatches) lossless
+            image.save(buffer, format="PNG")
+            mime = "image/png"
+        else:
+            # libjpeg(-turbo) does the DCT in SIMD; 4:2:0 subsampling and progressive
+            # Huffman tables shrink photos a lot with no visible loss
+            image.convert("RGB").save(
+                buffer, format="JPEG", quality=85, optimize=True, progressive=True, subsampling=2
+            )
+            mime = "image/jpeg"
+        with written_view(buffer) as view:
+            return to_data_url(view, mime)
+
+@st.cache_data(max_entries=16, show_spinner=False, hash_funcs=IMAGE_HASH_FUNCS)
+def encode_bytes_to_data_url(raw, mime, max_edge=MAX_IMAGE_EDGE):
+    """Convert uploaded image bytes to a data URL, cached per upload"""
+    return _encode_to_data_url(raw, mime, max_edge)
+
+@st.cache_data(max_entries=16, show_spinner=False, hash_funcs=IMAGE_HASH_FUNCS)
+def encode_result_to_webp(raw):
+    """Re-encode a generated image as WebP for download, cached per result"""
+    from PIL import Image
+    
+    with Image.open(io.BytesIO(raw)) as image, pooled_bytesio() as buffer:
+        # method=4 is libwebp's speed/size middle ground; quality 92 is visually lossless here
+        image.save(buffer, format="WEBP", quality=92, method=4)
+        with written_view(buffer) as view:
+            return bytes(view)
+
+@st.cache_resource(show_spinner=False, hash_funcs=IMAGE_HASH_FUNCS)
+def get_tile_data_url(tile_bytes, tile_mime, tile_name=None, max_edge=MAX_IMAGE_EDGE):
+    """Encode a tile swatch once for the life of the process"""
+    # cache_resource: tiles are static and shared by every session, so they should neither be
+    # evicted by uploads nor copied out of the cache on every hit
+    try:
+        # Payloads pre-encoded by build_tile_cache.py (several MB, so imported here rather
+        # than at the top); optional, tiles are encoded below when the module is missing
+        import tile_cache
+    except ImportError:
+        tile_cache = None
+    if tile_cache is not None and tile_cache.MAX_IMAGE_EDGE == max_edge:
+        # Only trust the prebuilt payload for the exact bytes it was built from; a changed tile
+        # file or the missing-file placeholder is encoded here instead
+        digest, prebuilt = tile_cache.TILES_B64.get(tile_name, (None, None))
+        if digest == _hash_bytes(tile_bytes):
+            return prebuilt
+    return _encode_to_data_url(tile_bytes, tile_mime, max_edge)
+
+# Finish keyword in the tile name -> finish instruction (checked in order, so glans wins over mat)
+FINISH_INSTRUCTIONS = {
+    "glans": "Apply glossy, reflective finish with sharp, clear reflections that accurately show the room's lighting",
+    "mat": "Apply matte, non-reflective finish with soft, diffused lighting and no sharp reflections",
+}
+
+# One pass over the name, whole words only; spelling variants map onto the keys above
+_FINISH_RE = re.compile(r"\b(hoogglans|glans|matte|mat)\b", re.IGNORECASE)
+_FINISH_KEYWORDS = {"hoogglans": "glans", "glans": "glans", "matte": "mat", "mat": "mat"}
 
 def get_finish_instruction(tile_name):
     """Get finish-specific instruction based on tile name"""
     if not tile_name:
         return "Apply appropriate finish based on reference image"
     
-    tile_name_lower = tile_name.lower()
-    if any(keyword in tile_name_lower for keyword in ["glans", "hoogglans"]):
-        return "Apply glossy, reflective finish with sharp, clear reflections that accurately show the room's lighting"
-    elif any(keyword in tile_name_lower for keyword in ["mat", "matte"]):
-        return "Apply matte, non-reflective finish with soft, diffused lighting and no sharp reflections"
-    else:
-        return "Apply finish matching the reference image characteristics"
+    found = {_FINISH_KEYWORDS[match.lower()] for match in _FINISH_RE.findall(tile_name)}
+    return next(
+        (instruction for keyword, instruction in FINISH_INSTRUCTIONS.items() if keyword in found),
+        "Apply finish matching the reference image characteristics",
+    )
 
 # def generate_with_inpainting_style(original_image, selected_tile, client, tile_name=""):
 #     """Use inpainting-style prompting to be more precise about what to change"""
@@ -182,16 +501,13 @@ def get_finish_instruction(tile_name):
 #         st.error(f"Fout bij het genereren van afbeelding: {str(e)}")
 #         return None
 
-def generate_with_ultra_specific_masking(original_image, selected_tile, client, tile_name=""):
-    """Use ultra-specific masking language to prevent fixture modification"""
-    
-    try:
-        bathroom_b64 = encode_image_to_base64(original_image)
-        tile_b64 = encode_image_to_base64(selected_tile)
-        
-        finish_instruction = get_finish_instruction(tile_name)
-        
-        ultra_specific_prompt = f"""
+# Appended when several variants are requested in a single call
+VARIANTS_INSTRUCTION = """
+VARIANTS: Produce {num_variants} distinct candidate renders of this same task, each as a separate generated image. Every variant must follow all rules above; vary only subtle aspects such as the exact panel pattern alignment.
+"""
+
+# Built once at import; only the finish instruction is filled in per call
+ULTRA_SPECIFIC_PROMPT = """
 CRITICAL MASKING TASK: Apply new wall panels ONLY to specific masked areas.
 
 MASKING RULES - ABSOLUTE BOUNDARIES:
@@ -229,51 +545,200 @@ TECHNICAL EXECUTION:
 
 VERIFICATION CHECK: Before applying panels, verify that NO part of the bathtub structure or toilet area will be modified. The bathtub must remain exactly as it is in the original photo.
 """
-        
-        # Generate the image
-        response = client.responses.create(
-            model="gpt-4.1",
-            input=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "input_text", "text": ultra_specific_prompt},
-                        {
-                            "type": "input_image",
-                            "image_url": f"data:image/png;base64,{bathroom_b64}",
-                        },
-                        {
-                            "type": "input_image",
-                            "image_url": f"data:image/png;base64,{tile_b64}",
-                        }
-                    ],
-                }
-            ],
-            tools=[{"type": "image_generation"}],
+
+# Fallback method: a lighter-touch prompt that changes too little rather than too much
+CONSERVATIVE_PROMPT = """
+CONSERVATIVE WALL PANEL APPLICATION:
+
+TASK: Replace wall covering on ONLY the most obvious, safe wall areas.
+
+ULTRA-CONSERVATIVE RULES:
+🔒 COMPLETELY OFF-LIMITS (DO NOT EVEN CONSIDER):
+- Anything connected to or near the bathtub
+- Anything connected to or near the toilet  
+- Any horizontal surfaces (floor, bathtub rim, etc.)
+- Any fixture-adjacent areas
+- Window and window surrounds
+
+🎯 SAFE MODIFICATION ZONES (ONLY IF CLEARLY SEPARATE):
+- Large, obvious background wall surfaces
+- Wall areas that are visibly distant from any fixture
+- Plain wall sections that clearly don't belong to fixtures
+
+APPLICATION METHOD:
+- Think like you're hanging wallpaper on a few select wall sections
+- Only touch areas you're 100% certain are main room walls
+- Show seamless panels with zero joints, grout, or texture lines
+- {finish_instruction}
+- Keep photorealistic quality and exact lighting
+
+SAFETY FIRST: When in doubt, don't modify. Better to change too little than to accidentally modify fixture areas.
+
+VERIFICATION: The bathtub should look exactly like the original photo - same color, same materials, same everything.
+"""
+
+class NoImageGenerated(Exception):
+    """Raised when the API response contains no generated image"""
+
+def build_ultra_specific_prompt(tile_name, num_variants=1):
+    """Fill in the ultra-specific prompt for a tile and variant count"""
+    finish_instruction = get_finish_instruction(tile_name)
+    
+    ultra_specific_prompt = ULTRA_SPECIFIC_PROMPT.format(finish_instruction=finish_instruction)
+    if num_variants > 1:
+        # One request for all variants: input tokens are billed once and only one RPM slot is used
+        ultra_specific_prompt += VARIANTS_INSTRUCTION.format(num_variants=num_variants)
+    return ultra_specific_prompt
+
+def build_conservative_prompt(tile_name, num_variants=1):
+    """Fill in the conservative prompt for a tile and variant count"""
+    conservative_prompt = CONSERVATIVE_PROMPT.format(finish_instruction=get_finish_instruction(tile_name))
+    if num_variants > 1:
+        conservative_prompt += VARIANTS_INSTRUCTION.format(num_variants=num_variants)
+    return conservative_prompt
+
+# Request parameters shared by every generation call, built once
+_TOOLS = [{"type": "image_generation"}]
+_STREAMING_TOOLS = [{"type": "image_generation", "partial_images": PARTIAL_IMAGES}]
+
+def _build_input(prompt, *image_urls):
+    """Shape a prompt and image data URLs into a single user message"""
+    content = [{"type": "input_text", "text": prompt}]
+    content.extend({"type": "input_image", "image_url": image_url} for image_url in image_urls)
+    return [{"role": "user", "content": content}]
+
+async def _generate_images(bathroom_url, tile_url, prompt, num_variants, client, on_partial_image=None):
+    """Run one generation request for a prompt and return a list of encoded images.
+
+    Raises NoImageGenerated when the response contains no image.
+    """
+    # Generate the image
+    response = await create_response_with_retry(
+        client,
+        on_partial_image=on_partial_image,
+        model="gpt-4.1",
+        input=_build_input(prompt, bathroom_url, tile_url),
+        tools=_TOOLS if on_partial_image is None else _STREAMING_TOOLS,
+    )
+    
+    # Extract image generation results in one pass, stopping once enough images are found
+    image_data = (
+        output.result
+        for output in response.output
+        if output.type == "image_generation_call"
+    )
+    # Keep the API's encoded bytes as-is; they double as the download payload
+    images = [base64.b64decode(image_base64) for image_base64 in itertools.islice(image_data, num_variants)]
+    
+    if not images:
+        raise NoImageGenerated()
+    return images
+
+async def _generate_with_prompt(bathroom_bytes, bathroom_mime, tile_bytes, tile_mime, prompt, client, tile_name="", num_variants=1, on_partial_image=None):
+    """Encode the inputs and generate images for a filled-in prompt.
+
+    Returns a list of generated images as encoded bytes, or None on failure.
+    on_partial_image, if given, receives streamed previews as base64 strings.
+    """
+    
+    try:
+        # Identical inputs (e.g. a double click on "Genereer") reuse the previous result.
+        # Keyed on the raw inputs, so a cache hit skips encoding as well.
+        # The prompt text itself is part of the key, so editing the prompt never serves stale results.
+        cache_key = (
+            _hash_bytes(bathroom_bytes),
+            _hash_bytes(tile_bytes),
+            prompt,
+            num_variants,
+            MAX_IMAGE_EDGE,
         )
+        cache = get_generation_cache()
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        # Extract image generation results
-        image_generation_calls = [
-            output
-            for output in response.output
-            if output.type == "image_generation_call"
-        ]
+        # Encode both images in parallel off the event loop (PIL and zlib release the GIL),
+        # so a concurrently running method keeps streaming while this one encodes
+        bathroom_url, tile_url = await asyncio.gather(
+            asyncio.to_thread(encode_bytes_to_data_url, bathroom_bytes, bathroom_mime),
+            asyncio.to_thread(get_tile_data_url, tile_bytes, tile_mime, tile_name),
+        )
         
-        image_data = [output.result for output in image_generation_calls]
+        # Keep payload sizes around for the debug expander
+        st.session_state["payload_sizes"] = {
+            "Badkamer": (len(bathroom_bytes), len(bathroom_url)),
+            "Wandpaneel": (len(tile_bytes), len(tile_url)),
+        }
         
-        if image_data:
-            image_base64 = image_data[0]
-            image_bytes = base64.b64decode(image_base64)
-            generated_image = Image.open(io.BytesIO(image_bytes))
-            return generated_image
-        else:
-            st.error("Geen afbeelding gegenereerd.")
-            return None
+        images = await _generate_images(
+            bathroom_url, tile_url, prompt, num_variants, client, on_partial_image=on_partial_image
+        )
+        # Only successful generations get here, so failures are never cached
+        cache.put(cache_key, images)
+        return images
         
+    except NoImageGenerated:
+        st.error("Geen afbeelding gegenereerd.")
+        return None
     except Exception as e:
         st.error(f"Fout bij het genereren van afbeelding: {str(e)}")
         return None
 
+async def generate_with_ultra_specific_masking(bathroom_bytes, bathroom_mime, tile_bytes, tile_mime, client, tile_name="", num_variants=1, on_partial_image=None):
+    """Use ultra-specific masking language to prevent fixture modification"""
+    return await _generate_with_prompt(
+        bathroom_bytes,
+        bathroom_mime,
+        tile_bytes,
+        tile_mime,
+        build_ultra_specific_prompt(tile_name, num_variants),
+        client,
+        tile_name=tile_name,
+        num_variants=num_variants,
+        on_partial_image=on_partial_image
+    )
+
+async def generate_with_conservative_approach(bathroom_bytes, bathroom_mime, tile_bytes, tile_mime, client, tile_name="", num_variants=1, on_partial_image=None):
+    """Most conservative approach - only touch obvious wall areas"""
+    return await _generate_with_prompt(
+        bathroom_bytes,
+        bathroom_mime,
+        tile_bytes,
+        tile_mime,
+        build_conservative_prompt(tile_name, num_variants),
+        client,
+        tile_name=tile_name,
+        num_variants=num_variants,
+        on_partial_image=on_partial_image
+    )
+
+# Method label (shown in the UI) -> generation coroutine
+GENERATION_METHODS = {
+    "Ultra Specifiek": generate_with_ultra_specific_masking,
+    "Conservatief": generate_with_conservative_approach,
+}
+
+async def generate_visualization(bathroom_bytes, bathroom_mime, tile_bytes, tile_mime, tile_name="", num_variants=1, methods=("Ultra Specifiek",), on_partial_image=None):
+    """Open an async client for this event loop and run every method concurrently.
+
+    Returns one result (a list of images, or None on failure) per method, in order.
+    on_partial_image, if given, is called as on_partial_image(method, partial_b64).
+    """
+    async with create_async_openai_client() as client:
+        # Each method is its own request, so the wait is the slowest one instead of the sum
+        return await asyncio.gather(*(
+            GENERATION_METHODS[method](
+                bathroom_bytes,
+                bathroom_mime,
+                tile_bytes,
+                tile_mime,
+                client,
+                tile_name=tile_name,
+                num_variants=num_variants,
+                on_partial_image=functools.partial(on_partial_image, method) if on_partial_image else None
+            )
+            for method in methods
+        ))
 
 # def generate_with_two_step_approach(original_image, selected_tile, client, tile_name=""):
 #     """Two-step approach: First analyze, then generate"""
@@ -389,82 +854,51 @@ VERIFICATION CHECK: Before applying panels, verify that NO part of the bathtub s
 #         st.error(f"Fout bij het genereren van afbeelding: {str(e)}")
 #         return None
 
+@st.cache_resource
+def load_tile_catalog():
+    """Read every tile swatch into memory once, shared by all sessions"""
+    return {
+        name: Path(path).read_bytes()
+        for name, path in TILE_OPTIONS.items()
+        if path and os.path.exists(path)
+    }
 
-# def generate_with_conservative_approach(original_image, selected_tile, client, tile_name=""):
-#     """Most conservative approach - only touch obvious wall areas"""
-    
-#     try:
-#         bathroom_b64 = encode_image_to_base64(original_image)
-#         tile_b64 = encode_image_to_base64(selected_tile)
-        
-#         finish_instruction = get_finish_instruction(tile_name)
-        
-#         conservative_prompt = f"""
-# CONSERVATIVE WALL PANEL APPLICATION:
-
-# TASK: Replace wall covering on ONLY the most obvious, safe wall areas.
-
-# ULTRA-CONSERVATIVE RULES:
-# 🔒 COMPLETELY OFF-LIMITS (DO NOT EVEN CONSIDER):
-# - Anything connected to or near the bathtub
-# - Anything connected to or near the toilet  
-# - Any horizontal surfaces (floor, bathtub rim, etc.)
-# - Any fixture-adjacent areas
-# - Window and window surrounds
-
-# 🎯 SAFE MODIFICATION ZONES (ONLY IF CLEARLY SEPARATE):
-# - Large, obvious background wall surfaces
-# - Wall areas that are visibly distant from any fixture
-# - Plain wall sections that clearly don't belong to fixtures
-
-# APPLICATION METHOD:
-# - Think like you're hanging wallpaper on a few select wall sections
-# - Only touch areas you're 100% certain are main room walls
-# - Show seamless panels with zero joints, grout, or texture lines
-# - {finish_instruction}
-# - Keep photorealistic quality and exact lighting
+# Small previews written by build_tile_cache.py; the full swatch is shown when they are missing
+THUMBNAIL_DIR = "tiles/thumbs"
+THUMBNAIL_EDGE = 256
 
-# SAFETY FIRST: When in doubt, don't modify. Better to change too little than to accidentally modify fixture areas.
+def thumbnail_filename(tile_path, tile_bytes):
+    """Thumbnail file name for a tile, tied to the exact source bytes it was made from"""
+    # A changed tile file gets a new name, so a stale thumbnail is simply never found
+    return f"{Path(tile_path).stem}-{_hash_bytes(tile_bytes).hex()}.jpg"
 
-# VERIFICATION: The bathtub should look exactly like the original photo - same color, same materials, same everything.
-# """
-        
-#         response = client.responses.create(
-#             model="gpt-4.1",
-#             input=[
-#                 {
-#                     "role": "user",
-#                     "content": [
-#                         {"type": "input_text", "text": conservative_prompt},
-#                         {
-#                             "type": "input_image",
-#                             "image_url": f"data:image/png;base64,{bathroom_b64}",
-#                         },
-#                         {
-#                             "type": "input_image",
-#                             "image_url": f"data:image/png;base64,{tile_b64}",
-#                         }
-#                     ],
-#                 }
-#             ],
-#             tools=[{"type": "image_generation"}],
-#         )
-        
-#         image_generation_calls = [
-#             output for output in response.output
-#             if output.type == "image_generation_call"
-#         ]
-        
-#         if image_generation_calls:
-#             image_data = image_generation_calls[0].result
-#             image_bytes = base64.b64decode(image_data)
-#             return Image.open(io.BytesIO(image_bytes))
-        
-#         return None
-        
-#     except Exception as e:
-#         st.error(f"Fout bij het genereren van afbeelding: {str(e)}")
-#         return None
+@st.cache_resource
+def load_thumbnail_paths():
+    """Map tile names to their prebuilt thumbnail, checked on disk once per process"""
+    thumbnails = {}
+    for name, tile_bytes in load_tile_catalog().items():
+        thumbnail_path = os.path.join(THUMBNAIL_DIR, thumbnail_filename(TILE_OPTIONS[name], tile_bytes))
+        if os.path.exists(thumbnail_path):
+            thumbnails[name] = thumbnail_path
+    return thumbnails
+
+@st.cache_resource
+def placeholder_tile_bytes():
+    """Grey PNG swatch shown when a tile file is missing, encoded once"""
+    from PIL import Image
+    
+    return image_to_png_bytes(Image.new('RGB', (200, 200), color='grey'))
+
+@st.cache_resource
+def library_debug_info():
+    """Library versions for the debug panel; they cannot change while the process runs"""
+    import openai
+    from PIL import features
+    
+    return [
+        f"OpenAI library version: {getattr(openai, '__version__', 'Unknown')}",
+        f"Pillow JPEG codec: libjpeg {features.version_codec('jpg') or 'unknown'} (turbo: {features.check_feature('libjpeg_turbo')})",
+    ]
 
 def main():
     st.set_page_config(
@@ -479,9 +913,9 @@ def main():
     st.title("🛁 Badkamer Wandpaneel Visualizer")
     st.markdown("Upload een foto van je badkamer en kies nieuwe wandpanelen om te zien hoe het eruit zou zien!")
     
-    # Initialize OpenAI client
+    # Initialize OpenAI client (validates the API key before anything else is shown)
     try:
-        client = get_openai_client()
+        get_openai_client()
     except Exception:
         # Errors from get_openai_client are handled with st.stop(),
         # but we catch here to prevent the app from continuing.
@@ -498,85 +932,90 @@ def main():
             key="bathroom_upload"
         )
         
+        bathroom_id = None
+        bathroom_bytes = None
+        bathroom_mime = None
         if uploaded_bathroom:
-            bathroom_image = Image.open(uploaded_bathroom)
-            st.image(bathroom_image, caption="Je badkamer", width=None)
+            # getvalue() copies the whole upload, so only read it when a new file arrives and keep
+            # the bytes for later reruns. They go to the model as-is when already PNG/JPEG.
+            if st.session_state.get("uploaded_id") != uploaded_bathroom.file_id:
+                st.session_state["uploaded_bytes"] = uploaded_bathroom.getvalue()
+                st.session_state["uploaded_id"] = uploaded_bathroom.file_id
+            bathroom_id = uploaded_bathroom.file_id
+            bathroom_bytes = st.session_state["uploaded_bytes"]
+            bathroom_mime = uploaded_bathroom.type
+            # st.image takes the encoded bytes directly, no PIL decode needed for display
+            st.image(bathroom_bytes, caption="Je badkamer", width=None)
     
     with col2:
         st.header("🏠 Kies je wandpanelen")
         
         # Choose from a predefined list
         st.subheader("Kies een wandpaneel uit de lijst")
-
-        # Define tile options (name -> image path)
-        tile_options = {
-            "--- Selecteer een wandpaneel ---": None,
-            "PVC Hoogglans Calacatta Wit": "tiles/pvc_hoogglans_calacatta_wit.jpg",
-            "PVC Hoogglans Bianco Venato Wit": "tiles/pvc_hoogglans_bianco_venato_wit.jpg",
-            "PVC Hoogglans Carrara Wit": "tiles/pvc_hoogglans_carrara_wit.jpg",
-            "PVC Hoogglans Effen Wit": "tiles/pvc_hoogglans_effen_wit.jpg",
-            "PVC Hoogglans Eclipse Marble": "tiles/pvc_hoogglans_eclipse_marble.jpg",
-            "PVC Hoogglans Glazed Taupe Marble": "tiles/pvc_hoogglans_glazed_taupe_marble.jpg",
-            "PVC Hoogglans Grigio Orobico Gold": "tiles/pvc_hoogglans_grigio_orobico_gold.jpg",
-            "PVC Hoogglans Marquina Zwart": "tiles/pvc_hoogglans_marquina_zwart.jpg",
-            "PVC Hoogglans Onyx Grigio": "tiles/pvc_hoogglans_onyx_grigio.jpg",
-            "PVC Hoogglans Stone Marble": "tiles/pvc_hoogglans_stone_marble.jpg",
-            "PVC Silver Wave Glans Grijs": "tiles/pvc_silver_wave_glans_grijs.jpg",
-            "PVC Carnico Glans Grijs": "tiles/pvc_carnico_glans_grijs.jpg",
-            "PVC Calacatta Gold Matte": "tiles/pvc_calacatta_gold_matte.jpg",
-            "PVC Carnico Mat Grijs": "tiles/pvc_carnico_mat_grijs.jpg",
-            "PVC Crema Marfil Mat Beige": "tiles/pvc_crema_marfil_mat_beige.jpg",
-            "PVC Nero Marquina Gold Mat Zwart": "tiles/pvc_nero_marquina_gold_mat_zwart.jpg",
-            "PVC Pietra Grey Mat Grijs": "tiles/pvc_pietra_grey_mat_grijs.jpg",
-            "PVC Sandstone Mat Beige": "tiles/pvc_sandstone_mat_beige.jpg",
-            "PVC Taupe Marble Matte": "tiles/pvc_taupe_marble_matte.jpg",
-            "SPC Beton Look Mat Grijs": "tiles/spc_beton_look_mat_grijs.jpg",
-            "SPC Breccia Pernice Mat": "tiles/spc_breccia_pernice_mat.jpg",
-            "SPC Carrara Mat Grijs": "tiles/spc_carrara_mat_grijs.jpg",
-            "SPC Carrara Matte White": "tiles/spc_carrara_matte_white.jpg",
-            "SPC Crema Marfil Mat Beige": "tiles/spc_crema_marfil_mat_beige.jpg",
-            "SPC Desert Mist Mat Taupe Beige": "tiles/spc_desert_mist_mat_taupe_beige.jpg",
-            "SPC Emperador Dark Mat Bruin": "tiles/spc_emperador_dark_mat_bruin.jpg",
-            "SPC Forest Slate Mat Groen Bruin": "tiles/spc_forest_slate_mat_groen_bruin.jpg",
-            "SPC Granite Mist Matte": "tiles/spc_granite_mist_matte.jpg",
-            "SPC Marmer Mat Beige Taupe": "tiles/spc_marmer_mat_beige_taupe.jpg",
-            "SPC Rustic Copper Stone Mat Koper": "tiles/spc_rustic_copper_stone_mat_koper.jpg",
-            "SPC Rustic Stone Mat": "tiles/spc_rustic_stone_mat.jpg",
-            "SPC Serpeggiante Marble Mat Beige Groen": "tiles/spc_serpeggiante_marble_mat_beige_groen.jpg",
-            "SPC Silk Marble Matte": "tiles/spc_silk_marble_matte.jpg",
-            "SPC Smoky Granite Matte": "tiles/spc_smoky_granite_matte.jpg",
-            "SPC Stone Grey Mat Grijs": "tiles/spc_stone_grey_mat_grijs.jpg",
-        }
         
         selected_tile_name = st.selectbox(
             "Kies een wandpaneel",
-            options=list(tile_options.keys())
+            options=TILE_NAMES
         )
         
         # Determine which tile to use
-        final_tile_image = None
+        tile_bytes = None
+        tile_mime = None
         
         if selected_tile_name != "--- Selecteer een wandpaneel ---":
-            tile_path = tile_options[selected_tile_name]
-            try:
-                final_tile_image = Image.open(tile_path)
-                st.image(final_tile_image, caption=f"Gekozen wandpaneel: {selected_tile_name}", width=None)
-            except FileNotFoundError:
+            tile_path = TILE_OPTIONS[selected_tile_name]
+            tile_bytes = load_tile_catalog().get(selected_tile_name)
+            if tile_bytes is not None:
+                tile_mime = "image/jpeg"
+                # A path lets Streamlit serve the small thumbnail from its media store; the full
+                # swatch bytes are only needed for the API payload
+                tile_preview = load_thumbnail_paths().get(selected_tile_name, tile_bytes)
+                st.image(tile_preview, caption=f"Gekozen wandpaneel: {selected_tile_name}", width=None)
+            else:
                 st.warning(f"Afbeelding voor '{selected_tile_name}' niet gevonden. Zorg dat het bestand op `{tile_path}` staat.")
-                # Create a placeholder image if file not found
-                final_tile_image = Image.new('RGB', (200, 200), color='grey')
-                st.image(final_tile_image, caption=f"Placeholder voor {selected_tile_name}", width=None)
+                # Use a placeholder image if file not found
+                tile_bytes = placeholder_tile_bytes()
+                tile_mime = "image/png"
+                st.image(tile_bytes, caption=f"Placeholder voor {selected_tile_name}", width=None)
 
     # Generate button
     st.markdown("---")
     col_center = st.columns([1, 2, 1])[1]
     
     with col_center:
+        num_variants = st.slider("Aantal varianten", min_value=1, max_value=3, value=1)
+        compare_methods = st.checkbox(
+            "Vergelijk met de 'Conservatief' methode",
+            help="Genereert tegelijk een tweede versie met een voorzichtigere aanpak, zonder extra wachttijd."
+        )
+        methods = tuple(GENERATION_METHODS) if compare_methods else ("Ultra Specifiek",)
+        
+        # Identifies the current inputs; a stored result is only shown or reused for the same key
+        result_key = None
+        if bathroom_bytes and tile_bytes:
+            # file_id identifies the upload without hashing its bytes on every rerun
+            result_key = (
+                bathroom_id,
+                _hash_bytes(tile_bytes),
+                selected_tile_name,
+                num_variants,
+                methods,
+            )
+        
         # Simplified generation button
         if st.button("✨ Genereer Visualisatie", type="primary", use_container_width=True):
-            if uploaded_bathroom and final_tile_image:
+            if result_key is None:
+                st.warning("⚠️ Upload eerst een badkamer foto en kies een wandpaneel om te beginnen!")
+            elif st.session_state.get("last_result_key") != result_key or not st.session_state.get("last_result_complete"):
                 
-                with st.spinner("Bezig met genereren via de 'Ultra Specifiek' methode..."):
+                method_names = " en ".join(f"'{method}'" for method in methods)
+                with st.spinner(f"Bezig met genereren via de {method_names} methode..."):
+                    
+                    # Streamed low-resolution previews (one per method), replaced by the final result once it is done
+                    previews = dict(zip(methods, (col.empty() for col in st.columns(len(methods)))))
+                    
+                    def show_partial_image(method, partial_b64):
+                        previews[method].image(base64.b64decode(partial_b64), caption=f"Voorlopig resultaat ({method})...", width=None)
                     
                     try:
                         # Determine tile name for prompt modification
@@ -584,54 +1023,93 @@ def main():
                         if selected_tile_name != "--- Selecteer een wandpaneel ---":
                             tile_name_for_prompt = selected_tile_name
 
-                        # Generate with the best method
-                        result_image = generate_with_ultra_specific_masking(
-                            Image.open(uploaded_bathroom), 
-                            final_tile_image, 
-                            client,
-                            tile_name=tile_name_for_prompt
-                        )
+                        # Generate with the best method; the script thread has no event loop of its own
+                        method_results = asyncio.run(generate_visualization(
+                            bathroom_bytes,
+                            bathroom_mime,
+                            tile_bytes,
+                            tile_mime,
+                            tile_name=tile_name_for_prompt,
+                            num_variants=num_variants,
+                            methods=methods,
+                            on_partial_image=show_partial_image
+                        ))
                     
                     except Exception as e:
                         st.error(f"Er is een fout opgetreden bij het genereren: {str(e)}")
-                        result_image = None
+                        method_results = [None] * len(methods)
+                    
+                    for preview in previews.values():
+                        preview.empty()
+                    
+                    # Flatten to (title, image) pairs; a method that failed has already shown its error
+                    result_images = []
+                    for letter, method, images in zip("ABC", methods, method_results):
+                        for i, result_bytes in enumerate(images or [], start=1):
+                            if len(methods) > 1:
+                                title = f"Variant {letter}{i if len(images) > 1 else ''} - {method}"
+                            elif len(images) > 1:
+                                title = f"Variant {i}"
+                            else:
+                                title = method
+                            result_images.append((title, result_bytes))
                     
-                    if result_image:
+                    if result_images:
+                        # Keep the result across reruns (e.g. clicking download) without calling the API again
+                        st.session_state["last_result_images"] = result_images
+                        st.session_state["last_result_key"] = result_key
+                        # A partial result (one method failed) is shown but not final: the next click
+                        # retries, and the generation cache serves the methods that already succeeded
+                        st.session_state["last_result_complete"] = all(method_results)
                         st.success("✅ Visualisatie gegenereerd!")
-                        
-                        # Display results
-                        st.header("🎨 Resultaat")
-                        
-                        # Show before and after
-                        result_col1, result_col2 = st.columns(2)
-                        
-                        with result_col1:
-                            st.subheader("Voor")
-                            st.image(Image.open(uploaded_bathroom), width=None)
-                        
-                        with result_col2:
-                            st.subheader("Na - Ultra Specifiek")
-                            st.image(result_image, width=None)
-                        
-                        # Download option
-                        st.markdown("---")
-                        
-                        # Convert image to bytes for download
-                        img_buffer = io.BytesIO()
-                        result_image.save(img_buffer, format='PNG')
-                        img_bytes = img_buffer.getvalue()
-                        
-                        st.download_button(
-                            label="💾 Download resultaat",
-                            data=img_bytes,
-                            file_name="badkamer_visualisatie.png",
-                            mime="image/png",
-                            type="primary",
-                            use_container_width=True
-                        )
-                        
-            else:
-                st.warning("⚠️ Upload eerst een badkamer foto en kies een wandpaneel om te beginnen!")
+        
+        result_images = None
+        if result_key is not None and st.session_state.get("last_result_key") == result_key:
+            result_images = st.session_state["last_result_images"]
+        
+        if result_images:
+            # Display results
+            st.header("🎨 Resultaat")
+            
+            # Show before and after (one column per variant)
+            result_cols = st.columns(1 + len(result_images))
+            
+            with result_cols[0]:
+                st.subheader("Voor")
+                st.image(bathroom_bytes, width=None)
+            
+            for result_col, (title, result_bytes) in zip(result_cols[1:], result_images):
+                with result_col:
+                    st.subheader(f"Na - {title}")
+                    st.image(result_bytes, width=None)
+            
+            # Download option
+            st.markdown("---")
+            
+            # The API already returns encoded image bytes, so by default offer them without re-encoding
+            download_format = st.selectbox(
+                "Downloadformaat",
+                options=("Origineel", "WebP (kleiner bestand)"),
+                key="download_format"
+            )
+            for i, (title, result_bytes) in enumerate(result_images, start=1):
+                suffix = "" if len(result_images) == 1 else f"_variant_{i}"
+                if download_format == "Origineel":
+                    # Label the download with the format the API actually returned
+                    result_mime = detect_image_mime(result_bytes, fallback="image/png")
+                else:
+                    result_bytes = encode_result_to_webp(result_bytes)
+                    result_mime = "image/webp"
+                extension = "jpg" if result_mime == "image/jpeg" else result_mime.split("/")[1]
+                st.download_button(
+                    label="💾 Download resultaat" if not suffix else f"💾 Download {title}",
+                    data=result_bytes,
+                    file_name=f"badkamer_visualisatie{suffix}.{extension}",
+                    mime=result_mime,
+                    type="primary",
+                    use_container_width=True,
+                    key=f"download{suffix}"
+                )
 
     # Footer
     st.markdown("---")
@@ -639,12 +1117,21 @@ def main():
     
     # Debug info
     with st.expander("🔧 Debug Info"):
-        st.write(f"OpenAI library version: {getattr(openai, '__version__', 'Unknown')}")
-        try:
-            client = get_openai_client() 
-            st.write(f"Client has 'responses' attribute: {hasattr(client, 'responses')}")
-        except Exception as e:
-            st.write(f"Could not check client attributes: {e}")
+        # The expander body runs on every rerun even when collapsed, so the probes are opt-in
+        if st.checkbox("Toon debug info", key="show_debug"):
+            for line in library_debug_info():
+                st.write(line)
+            try:
+                client = get_openai_client()
+                st.write(f"Client has 'responses' attribute: {hasattr(client, 'responses')}")
+            except Exception as e:
+                st.write(f"Could not check client attributes: {e}")
+            payload_sizes = st.session_state.get("payload_sizes", {})
+            for label, (raw_size, b64_size) in payload_sizes.items():
+                st.write(f"{label}: {raw_size / 1024:.0f} KB upload -> {b64_size / 1024:.0f} KB base64 payload")
+            if payload_sizes:
+                saved = sum(raw_size * 4 / 3 - b64_size for raw_size, b64_size in payload_sizes.values())
+                st.write(f"Saved by downscaling/re-encoding: {saved / 1024:.0f} KB base64")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,60 @@
+"""Pre-encode every tile swatch into tile_cache.py and write preview thumbnails at build time.
+
+Run once when building the image (and again whenever a file in tiles/ changes):
+
+    python build_tile_cache.py
+"""
+import sys
+from pathlib import Path
+
+from PIL import Image
+
+from app import MAX_IMAGE_EDGE, THUMBNAIL_DIR, THUMBNAIL_EDGE, _encode_to_data_url, _hash_bytes, thumbnail_filename
+from tile_catalog import TILE_OPTIONS
+
+# Tile paths in the catalog are relative to the app, so resolve everything from here
+# rather than from the current directory
+ROOT = Path(__file__).resolve().parent
+OUTPUT = ROOT / "tile_cache.py"
+
+def write_thumbnail(path):
+    """Save a small JPEG preview of a tile under THUMBNAIL_DIR"""
+    # Drop thumbnails of earlier versions of this tile; their names carry the old digest
+    for stale in (ROOT / THUMBNAIL_DIR).glob(f"{path.stem}-*.jpg"):
+        stale.unlink()
+    with Image.open(path) as image:
+        image.thumbnail((THUMBNAIL_EDGE, THUMBNAIL_EDGE), Image.LANCZOS)
+        image.convert("RGB").save(
+            ROOT / THUMBNAIL_DIR / thumbnail_filename(path, path.read_bytes()), format="JPEG", quality=85, optimize=True
+        )
+
+def main():
+    tiles_b64 = {}
+    for name, path in TILE_OPTIONS.items():
+        if path and (ROOT / path).exists():
+            raw = (ROOT / path).read_bytes()
+            # Same encoder as the request path, so the payload is identical to a runtime encode.
+            # The source digest lets the app skip entries whose tile file has changed since.
+            tiles_b64[name] = (_hash_bytes(raw), _encode_to_data_url(raw, "image/jpeg", MAX_IMAGE_EDGE))
+
+    if not tiles_b64:
+        # Don't replace a good cache with an empty one
+        sys.exit(f"No tile files found under {ROOT}; {OUTPUT.name} was not written")
+
+    (ROOT / THUMBNAIL_DIR).mkdir(parents=True, exist_ok=True)
+    for name in tiles_b64:
+        write_thumbnail(ROOT / TILE_OPTIONS[name])
+
+    lines = [
+        "# Generated by build_tile_cache.py - do not edit.",
+        f"MAX_IMAGE_EDGE = {MAX_IMAGE_EDGE}",
+        "# tile name -> (blake2b digest of the source file, data URL)",
+        "TILES_B64: dict[str, tuple[bytes, str]] = {",
+        *(f"    {name!r}: ({digest!r}, {url!r})," for name, (digest, url) in tiles_b64.items()),
+        "}",
+    ]
+    OUTPUT.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    print(f"Wrote {len(tiles_b64)} tiles to {OUTPUT.name} and thumbnails to {THUMBNAIL_DIR}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Static wall panel catalog: tile name -> swatch image path.
+
+Kept out of app.py because Streamlit re-executes the main script on every rerun, while an
+imported module is only loaded once per process.
+"""
+from types import MappingProxyType
+
+_TILE_OPTIONS = {
+    "--- Selecteer een wandpaneel ---": None,
+    "PVC Hoogglans Calacatta Wit": "tiles/pvc_hoogglans_calacatta_wit.jpg",
+    "PVC Hoogglans Bianco Venato Wit": "tiles/pvc_hoogglans_bianco_venato_wit.jpg",
+    "PVC Hoogglans Carrara Wit": "tiles/pvc_hoogglans_carrara_wit.jpg",
+    "PVC Hoogglans Effen Wit": "tiles/pvc_hoogglans_effen_wit.jpg",
+    "PVC Hoogglans Eclipse Marble": "tiles/pvc_hoogglans_eclipse_marble.jpg",
+    "PVC Hoogglans Glazed Taupe Marble": "tiles/pvc_hoogglans_glazed_taupe_marble.jpg",
+    "PVC Hoogglans Grigio Orobico Gold": "tiles/pvc_hoogglans_grigio_orobico_gold.jpg",
+    "PVC Hoogglans Marquina Zwart": "tiles/pvc_hoogglans_marquina_zwart.jpg",
+    "PVC Hoogglans Onyx Grigio": "tiles/pvc_hoogglans_onyx_grigio.jpg",
+    "PVC Hoogglans Stone Marble": "tiles/pvc_hoogglans_stone_marble.jpg",
+    "PVC Silver Wave Glans Grijs": "tiles/pvc_silver_wave_glans_grijs.jpg",
+    "PVC Carnico Glans Grijs": "tiles/pvc_carnico_glans_grijs.jpg",
+    "PVC Calacatta Gold Matte": "tiles/pvc_calacatta_gold_matte.jpg",
+    "PVC Carnico Mat Grijs": "tiles/pvc_carnico_mat_grijs.jpg",
+    "PVC Crema Marfil Mat Beige": "tiles/pvc_crema_marfil_mat_beige.jpg",
+    "PVC Nero Marquina Gold Mat Zwart": "tiles/pvc_nero_marquina_gold_mat_zwart.jpg",
+    "PVC Pietra Grey Mat Grijs": "tiles/pvc_pietra_grey_mat_grijs.jpg",
+    "PVC Sandstone Mat Beige": "tiles/pvc_sandstone_mat_beige.jpg",
+    "PVC Taupe Marble Matte": "tiles/pvc_taupe_marble_matte.jpg",
+    "SPC Beton Look Mat Grijs": "tiles/spc_beton_look_mat_grijs.jpg",
+    "SPC Breccia Pernice Mat": "tiles/spc_breccia_pernice_mat.jpg",
+    "SPC Carrara Mat Grijs": "tiles/spc_carrara_mat_grijs.jpg",
+    "SPC Carrara Matte White": "tiles/spc_carrara_matte_white.jpg",
+    "SPC Crema Marfil Mat Beige": "tiles/spc_crema_marfil_mat_beige.jpg",
+    "SPC Desert Mist Mat Taupe Beige": "tiles/spc_desert_mist_mat_taupe_beige.jpg",
+    "SPC Emperador Dark Mat Bruin": "tiles/spc_emperador_dark_mat_bruin.jpg",
+    "SPC Forest Slate Mat Groen Bruin": "tiles/spc_forest_slate_mat_groen_bruin.jpg",
+    "SPC Granite Mist Matte": "tiles/spc_granite_mist_matte.jpg",
+    "SPC Marmer Mat Beige Taupe": "tiles/spc_marmer_mat_beige_taupe.jpg",
+    "SPC Rustic Copper Stone Mat Koper": "tiles/spc_rustic_copper_stone_mat_koper.jpg",
+    "SPC Rustic Stone Mat": "tiles/spc_rustic_stone_mat.jpg",
+    "SPC Serpeggiante Marble Mat Beige Groen": "tiles/spc_serpeggiante_marble_mat_beige_groen.jpg",
+    "SPC Silk Marble Matte": "tiles/spc_silk_marble_matte.jpg",
+    "SPC Smoky Granite Matte": "tiles/spc_smoky_granite_matte.jpg",
+    "SPC Stone Grey Mat Grijs": "tiles/spc_stone_grey_mat_grijs.jpg",
+}
+# Read-only view so nothing can mutate the shared catalog at runtime
+TILE_OPTIONS = MappingProxyType(_TILE_OPTIONS)
+# Selectbox options, built once instead of on every rerun
+TILE_NAMES = tuple(TILE_OPTIONS)